@@ -1,19 +1,25 @@
+import sys
+from bisect import bisect_left
+from collections import defaultdict, deque
 from collections.abc import Iterable
 from dataclasses import dataclass
+from heapq import merge
 from typing import Any
 
 from ass_parser import AssEvent, AssFile
 
-from oc_tools.util import first, last
+MAX_INTERNED_TEXT_LENGTH = 4096
 
 
 class BaseChange:
+    __slots__ = ()
+
     @property
     def sort_key(self) -> Any:
         raise NotImplementedError("not implemented")
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LineRemovedChange(BaseChange):
     event: AssEvent
 
@@ -29,7 +35,7 @@ class LineRemovedChange(BaseChange):
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LineChangedTextChange(BaseChange):
     old_event: AssEvent
     new_event: AssEvent
@@ -46,7 +52,7 @@ class LineChangedTextChange(BaseChange):
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LineChangedTimeChange(BaseChange):
     old_event: AssEvent
     new_event: AssEvent
@@ -59,7 +65,7 @@ class LineChangedTimeChange(BaseChange):
         return f"Line #{self.old_event.number}\n    Fixed timing\n"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LineAddedChange(BaseChange):
     after_event: AssEvent | None
     before_event: AssEvent | None
@@ -96,63 +102,91 @@ class LineAddedChange(BaseChange):
         return "???\n" "    Missing line →\n" f"    {self.new_event.text}\n"
 
 
+def pop_unmatched(
+    index: dict[Any, deque[AssEvent]], key: Any, matched: set[int]
+) -> AssEvent | None:
+    queue = index.get(key)
+    while queue:
+        event = queue.popleft()
+        if id(event) not in matched:
+            return event
+    return None
+
+
 def collect_changes(a_ass: AssFile, b_ass: AssFile) -> Iterable[BaseChange]:
-    handled_b_events: list[AssEvent] = []
+    by_full: defaultdict[Any, deque[AssEvent]] = defaultdict(deque)
+    by_text_style: defaultdict[Any, deque[AssEvent]] = defaultdict(deque)
+    by_time_style: defaultdict[Any, deque[AssEvent]] = defaultdict(deque)
+    for event in b_ass.events:
+        text, start, end, style_name = (
+            event.text,
+            event.start,
+            event.end,
+            event.style_name,
+        )
+        by_full[text, start, end, style_name].append(event)
+        by_text_style[text, style_name].append(event)
+        by_time_style[start, end, style_name].append(event)
 
+    matched_b_events: set[int] = set()
+
+    # changes of a_ass events come out ordered by their sort key already
+    changes: list[BaseChange] = []
     for event1 in a_ass.events:
-        if event2 := first(
-            event
-            for event in b_ass.events
-            if event1.text == event.text
-            and event1.start == event.start
-            and event1.end == event.end
-            and event1.style_name == event.style_name
+        text, start, end, style_name = (
+            event1.text,
+            event1.start,
+            event1.end,
+            event1.style_name,
+        )
+
+        if event2 := pop_unmatched(
+            by_full, (text, start, end, style_name), matched_b_events
         ):
-            pass
-
-        elif event2 := first(
-            event
-            for event in b_ass.events
-            if (
-                event1.text == event.text
-                and event1.style_name == event.style_name
-                and (event1.start != event.start or event1.end != event.end)
-            )
+            matched_b_events.add(id(event2))
+            continue
+
+        if event2 := pop_unmatched(
+            by_text_style, (text, style_name), matched_b_events
         ):
-            yield LineChangedTimeChange(event1, event2)
-
-        elif event2 := first(
-            event
-            for event in b_ass.events
-            if (
-                event1.start == event.start
-                and event1.end == event.end
-                and event1.style_name == event.style_name
-                and event1.text != event.text
-            )
+            changes.append(LineChangedTimeChange(event1, event2))
+
+        elif event2 := pop_unmatched(
+            by_time_style, (start, end, style_name), matched_b_events
         ):
-            yield LineChangedTextChange(event1, event2)
+            changes.append(LineChangedTextChange(event1, event2))
 
         else:
-            yield LineRemovedChange(event1)
+            changes.append(LineRemovedChange(event1))
 
         if event2:
-            handled_b_events.append(event2)
+            matched_b_events.add(id(event2))
 
-    sorted_a_events = list(sorted(a_ass.events, key=lambda event: event.start))
+    sorted_a_events = list(a_ass.events)
+    a_starts = [event.start for event in sorted_a_events]
+    if any(a_starts[i] > a_starts[i + 1] for i in range(len(a_starts) - 1)):
+        sorted_a_events.sort(key=lambda event: event.start)
+        a_starts.sort()
+
+    added_changes: list[BaseChange] = []
     for event2 in b_ass.events:
-        if event2 in handled_b_events:
+        if id(event2) in matched_b_events:
             continue
-        event1a = last(
-            event for event in sorted_a_events if event.start < event2.start
-        )
-        event1b = first(
-            event for event in sorted_a_events if event.start >= event2.start
-        )
-        yield LineAddedChange(event1a, event1b, event2)
+        i = bisect_left(a_starts, event2.start)
+        event1a = sorted_a_events[i - 1] if i > 0 else None
+        event1b = sorted_a_events[i] if i < len(sorted_a_events) else None
+        added_changes.append(LineAddedChange(event1a, event1b, event2))
+    added_changes.sort(key=lambda change: change.sort_key)
+
+    yield from merge(
+        changes, added_changes, key=lambda change: change.sort_key
+    )
 
 
 def postprocess_ass(ass_file: AssFile, keep_newlines: bool) -> None:
     if not keep_newlines:
         for event in ass_file.events:
-            event.text = event.text.replace(r"\N", " ")
+            text = event.text.replace(r"\N", " ")
+            if len(text) < MAX_INTERNED_TEXT_LENGTH:
+                text = sys.intern(text)
+            event.text = text
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import pickle
+from collections.abc import Callable
+from pathlib import Path
+from typing import TypeVar
+
+import xdg
+from ass_parser import AssFile, read_ass
+
+T = TypeVar("T")
+
+CACHE_DIR = Path(xdg.XDG_CACHE_HOME) / "oc-tools"
+
+
+def load_cached(
+    path: Path,
+    namespace: str,
+    loader: Callable[[Path], T],
+    stat: os.stat_result | None = None,
+) -> T:
+    """Load a file through an on-disk pickle cache.
+
+    Cache entries are invalidated whenever the file's mtime or size change.
+    Entries are keyed by the resolved path, so if the loaded value stores
+    the path it was loaded from, callers should rebind it to ``path``.
+
+    :param path: path to the file to load
+    :param namespace: name of the cache subdirectory
+    :param loader: function that parses the file on cache miss
+    :param stat: result of stat() on the file, if already known
+    :return: parsed file
+    """
+    if stat is None:
+        stat = path.stat()
+    resolved_path = str(path.resolve())
+    signature = (resolved_path, stat.st_mtime_ns, stat.st_size)
+    cache_path = (
+        CACHE_DIR
+        / namespace
+        / (hashlib.blake2b(resolved_path.encode()).hexdigest() + ".pkl")
+    )
+
+    try:
+        with cache_path.open("rb") as handle:
+            cached_signature, value = pickle.load(handle)
+        if cached_signature == signature:
+            return value
+    except Exception:
+        pass
+
+    value = loader(path)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as handle:
+            pickle.dump(
+                (signature, value), handle, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        tmp_path.replace(cache_path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+
+    return value
+
+
+def cached_read_ass(path: Path, stat: os.stat_result | None = None) -> AssFile:
+    return load_cached(path, "ass", read_ass, stat=stat)
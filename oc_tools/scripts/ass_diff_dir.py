@@ -1,11 +1,13 @@
-#!/usr/bin/env python3.9
+#!/usr/bin/env python3
 import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
-from ass_parser import read_ass
-
 from oc_tools import ass_diff
+from oc_tools.cache import cached_read_ass
 
 
 def parse_args() -> argparse.Namespace:
@@ -24,30 +26,59 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
+def diff_files(
+    path1: Path,
+    stat1: os.stat_result,
+    path2: Path,
+    keep_newlines: bool,
+    quiet: bool,
+) -> tuple[str, str]:
+    try:
+        stat2 = path2.stat()
+    except FileNotFoundError:
+        return f"{path1}: {path2} does not exist\n", ""
 
-    for path1 in sorted(args.dir1.iterdir(), key=lambda path: path.name):
-        if path1.suffix != ".ass" or not path1.is_file():
-            continue
+    a_ass = cached_read_ass(path1, stat1)
+    b_ass = cached_read_ass(path2, stat2)
+    ass_diff.postprocess_ass(a_ass, keep_newlines=keep_newlines)
+    ass_diff.postprocess_ass(b_ass, keep_newlines=keep_newlines)
 
-        path2 = args.dir2 / path1.name
-        if not path2.exists():
-            print(f"{path1}: {path2} does not exist", file=sys.stderr)
-            continue
+    changes = list(ass_diff.collect_changes(a_ass, b_ass))
+    err = f"{path1}: {path2} differs\n" if changes else ""
+    out = ""
+    if not quiet:
+        out = "".join(f"{change}\n" for change in changes)
+    return err, out
 
-        a_ass = read_ass(path1)
-        b_ass = read_ass(path2)
-        ass_diff.postprocess_ass(a_ass, keep_newlines=args.keep_newlines)
-        ass_diff.postprocess_ass(b_ass, keep_newlines=args.keep_newlines)
 
-        changes = list(ass_diff.collect_changes(a_ass, b_ass))
-        if changes:
-            print(f"{path1}: {path2} differs", file=sys.stderr)
+def main() -> None:
+    args = parse_args()
+
+    with os.scandir(args.dir1) as entries:
+        entries1 = sorted(
+            (
+                entry
+                for entry in entries
+                if entry.name.endswith(".ass") and entry.is_file()
+            ),
+            key=lambda entry: entry.name,
+        )
+    paths1 = [Path(entry.path) for entry in entries1]
+    stats1 = [entry.stat() for entry in entries1]
+    paths2 = [args.dir2 / entry.name for entry in entries1]
 
-        if not args.quiet:
-            for change in sorted(changes, key=lambda change: change.sort_key):
-                print(change)
+    with ProcessPoolExecutor() as executor:
+        for err, out in executor.map(
+            partial(
+                diff_files, keep_newlines=args.keep_newlines, quiet=args.quiet
+            ),
+            paths1,
+            stats1,
+            paths2,
+            chunksize=max(1, len(paths1) // ((os.cpu_count() or 1) * 4)),
+        ):
+            sys.stderr.write(err)
+            sys.stdout.write(out)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-#!/usr/bin/env python3.9
+#!/usr/bin/env python3
 import argparse
 import sys
 from pathlib import Path
@@ -30,7 +30,7 @@ def main() -> None:
     ass_diff.postprocess_ass(b_ass, keep_newlines=args.keep_newlines)
 
     changes = list(ass_diff.collect_changes(a_ass, b_ass))
-    for change in sorted(changes, key=lambda change: change.sort_key):
+    for change in changes:
         print(change)
 
     if changes:
@@ -1,6 +1,7 @@
-#!/usr/bin/env python3.8
+#!/usr/bin/env python3
 import argparse
 import re
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
 import git
@@ -22,6 +23,17 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def diff_texts(a_text: str, b_text: str, keep_newlines: bool) -> str:
+    a_ass = read_ass(a_text)
+    b_ass = read_ass(b_text)
+    ass_diff.postprocess_ass(a_ass, keep_newlines=keep_newlines)
+    ass_diff.postprocess_ass(b_ass, keep_newlines=keep_newlines)
+
+    return "".join(
+        f"{change}\n" for change in ass_diff.collect_changes(a_ass, b_ass)
+    )
+
+
 @wrap_exceptions
 def main() -> None:
     args = parse_args()
@@ -31,40 +43,46 @@ def main() -> None:
     commit2 = repo.commit(args.commit)
     diff_index = commit1.diff(commit2)
 
-    for diff_item in diff_index.iter_change_type("M"):
-        if not all(
-            [
-                diff_item.a_blob.path.endswith(".ass"),
-                diff_item.b_blob.path.endswith(".ass"),
-            ]
-        ):
-            continue
-
-        path = Path(diff_item.a_path).name
-        match = re.search(r"(\d+)", path)
-        if not match:
-            raise ValueError(
-                "Cannot infer episode number from filename {path.name}"
+    with ProcessPoolExecutor() as executor:
+        jobs: list[tuple[str, Future[str]]] = []
+
+        for diff_item in diff_index.iter_change_type("M"):
+            if not all(
+                [
+                    diff_item.a_blob.path.endswith(".ass"),
+                    diff_item.b_blob.path.endswith(".ass"),
+                ]
+            ):
+                continue
+
+            path = Path(diff_item.a_path).name
+            match = re.search(r"(\d+)", path)
+            if not match:
+                raise ValueError(
+                    "Cannot infer episode number from filename {path.name}"
+                )
+            ep_number = int(match.group(1))
+            header = f"Episode {ep_number:02d}"
+
+            # blobs are read here rather than in the workers, since
+            # GitPython streams all objects through a single git process
+            a_text = diff_item.a_blob.data_stream.read().decode("utf-8")
+            b_text = diff_item.b_blob.data_stream.read().decode("utf-8")
+
+            jobs.append(
+                (
+                    header,
+                    executor.submit(
+                        diff_texts, a_text, b_text, args.keep_newlines
+                    ),
+                )
             )
-        ep_number = int(match.group(1))
-        header = f"Episode {ep_number:02d}"
-        print(header)
-        print("-" * len(header))
-        print()
-
-        a_blob = diff_item.a_blob.data_stream.read().decode("utf-8")
-        b_blob = diff_item.b_blob.data_stream.read().decode("utf-8")
-
-        a_ass = read_ass(a_blob)
-        b_ass = read_ass(b_blob)
-        ass_diff.postprocess_ass(a_ass, keep_newlines=args.keep_newlines)
-        ass_diff.postprocess_ass(b_ass, keep_newlines=args.keep_newlines)
-
-        for change in sorted(
-            ass_diff.collect_changes(a_ass, b_ass),
-            key=lambda change: change.sort_key,
-        ):
-            print(change)
+
+        for header, job in jobs:
+            print(header)
+            print("-" * len(header))
+            print()
+            print(job.result(), end="")
 
 
 if __name__ == "__main__":
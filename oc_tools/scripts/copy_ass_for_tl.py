@@ -2,7 +2,7 @@
 import argparse
 import re
 import sys
-from collections.abc import Callable, Iterable
+from collections.abc import Iterable
 from copy import copy
 from pathlib import Path
 from subprocess import PIPE, run
@@ -13,6 +13,7 @@ import lxml.etree
 from oc_tools.util import str_to_ms, wrap_exceptions
 
 ASS_EXTENSIONS = {".ass"}
+MAPPED_ACTORS = ["[chapter]", "[karaoke]", "[series title]"]
 
 
 def parse_language(language: str) -> str:
@@ -49,9 +50,7 @@ def read_ass(path: Path) -> ass_parser.AssFile:
 def make_ass_template(
     src_ass_file: ass_parser.AssFile,
     meta_override: dict[str, str],
-    chapter_map: dict[str, str],
-    karaoke_map: dict[str, str],
-    series_title_map: dict[str, str],
+    event_maps: dict[str, dict[str, str]],
 ) -> ass_parser.AssFile:
     new_ass_file = ass_parser.AssFile()
 
@@ -68,14 +67,10 @@ def make_ass_template(
     for event in src_ass_file.events:
         new_event = copy(event)
 
-        if is_event_chapter(event) and event.text in chapter_map:
-            new_event.text = chapter_map[event.text]
-
-        elif is_event_karaoke(event) and event.text in karaoke_map:
-            new_event.text = karaoke_map[event.text]
-
-        elif is_event_series_title(event) and event.text in series_title_map:
-            new_event.text = series_title_map[event.text]
+        event_map = event_maps.get(event.actor)
+        text = event_map.get(event.text) if event_map else None
+        if text is not None:
+            new_event.text = text
 
         else:
             new_event.note = new_event.text
@@ -86,49 +81,24 @@ def make_ass_template(
     return new_ass_file
 
 
-def create_event_map(
-    src_ass_file: ass_parser.AssFile,
-    dst_ass_file: ass_parser.AssFile,
-    key: Callable[[ass_parser.AssEvent], bool],
-) -> dict[str, str]:
-    src_events = [event for event in src_ass_file.events if key(event)]
-    dst_events = [event for event in dst_ass_file.events if key(event)]
-    mapping: dict[str, str] = {}
-    for src_event, dst_event in zip(src_events, dst_events):
-        mapping[src_event.text] = dst_event.text
-    return mapping
-
-
-def is_event_chapter(event: ass_parser.AssEvent) -> bool:
-    return event.actor == "[chapter]"
-
-
-def is_event_karaoke(event: ass_parser.AssEvent) -> bool:
-    return event.actor == "[karaoke]"
-
+def group_texts_by_actor(ass_file: ass_parser.AssFile) -> dict[str, list[str]]:
+    groups: dict[str, list[str]] = {actor: [] for actor in MAPPED_ACTORS}
+    for event in ass_file.events:
+        group = groups.get(event.actor)
+        if group is not None:
+            group.append(event.text)
+    return groups
 
-def is_event_series_title(event: ass_parser.AssEvent) -> bool:
-    return event.actor == "[series title]"
 
-
-def create_chapter_map(
+def create_event_maps(
     src_ass_file: ass_parser.AssFile, dst_ass_file: ass_parser.AssFile
-) -> dict[str, str]:
-    return create_event_map(src_ass_file, dst_ass_file, key=is_event_chapter)
-
-
-def create_karaoke_map(
-    src_ass_file: ass_parser.AssFile, dst_ass_file: ass_parser.AssFile
-) -> dict[str, str]:
-    return create_event_map(src_ass_file, dst_ass_file, key=is_event_karaoke)
-
-
-def create_series_title_map(
-    src_ass_file: ass_parser.AssFile, dst_ass_file: ass_parser.AssFile
-) -> dict[str, str]:
-    return create_event_map(
-        src_ass_file, dst_ass_file, key=is_event_series_title
-    )
+) -> dict[str, dict[str, str]]:
+    src_groups = group_texts_by_actor(src_ass_file)
+    dst_groups = group_texts_by_actor(dst_ass_file)
+    return {
+        actor: dict(zip(src_groups[actor], dst_groups[actor]))
+        for actor in MAPPED_ACTORS
+    }
 
 
 def get_meta_override(ass_file: ass_parser.AssEvent) -> dict[str, str]:
@@ -171,20 +141,12 @@ def main() -> None:
     ref_dst_ass_file = read_ass(ref_dst_ass_path)
 
     meta_override = get_meta_override(ref_dst_ass_file)
-    chapter_map = create_chapter_map(ref_src_ass_file, ref_dst_ass_file)
-    karaoke_map = create_karaoke_map(ref_src_ass_file, ref_dst_ass_file)
-    series_title_map = create_series_title_map(
-        ref_src_ass_file, ref_dst_ass_file
-    )
+    event_maps = create_event_maps(ref_src_ass_file, ref_dst_ass_file)
 
     for src_path in args.source:
         src_ass_file = read_ass(src_path)
         new_ass_file = make_ass_template(
-            src_ass_file,
-            meta_override,
-            chapter_map,
-            karaoke_map,
-            series_title_map,
+            src_ass_file, meta_override, event_maps
         )
         dst_path = (
             src_path.parent
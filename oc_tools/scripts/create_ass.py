@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import re
 import sys
 from collections.abc import Iterable
 from copy import copy
@@ -13,6 +14,9 @@ from oc_tools.util import str_to_ms, wrap_exceptions
 
 VIDEO_EXTENSIONS = {".mkv", ".mp4"}
 ASS_EXTENSIONS = {".ass"}
+SONG_STYLE_NAME_REGEX = re.compile(
+    "^(?:opening|ending|op|ed|lyrics|karaoke)", flags=re.I
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -96,8 +100,8 @@ def main() -> None:
 
             if args.copy_events:
                 for event in other_ass_file.events:
-                    if event.style_name.lower().startswith(
-                        ("opening", "ending", "op", "ed", "lyrics", "karaoke")
+                    if SONG_STYLE_NAME_REGEX.match(
+                        event.style_name
                     ) or event.actor.startswith("["):
                         ass_file.events.append(copy(event))
 
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import json
 import sys
 from pathlib import Path
-from subprocess import PIPE, run
+from subprocess import DEVNULL, PIPE, run
 from typing import Any
 
 from oc_tools.util import wrap_exceptions
@@ -51,25 +52,47 @@ def extract_track(source_path: Path, track_id: int) -> bytes:
     return result.stdout
 
 
+def extract_track_to(
+    source_path: Path, track_id: int, target_path: Path
+) -> None:
+    run(
+        [
+            "mkvextract",
+            "tracks",
+            "-r",
+            "/dev/null",
+            source_path,
+            f"{track_id}:{target_path}",
+        ],
+        check=True,
+        stdout=DEVNULL,
+    )
+
+
+@functools.lru_cache(maxsize=8)
 def get_info(source_path: Path) -> Any:
     result = run(["mkvmerge", "-J", str(source_path)], check=True, stdout=PIPE)
     return json.loads(result.stdout.decode())
 
 
-def extract_attachment(source_path: Path, attachment_id: int) -> bytes:
-    result = run(
+def extract_attachments_to(
+    source_path: Path, targets: dict[int, Path]
+) -> None:
+    run(
         [
             "mkvextract",
             "attachments",
             "-r",
             "/dev/null",
             source_path,
-            f"{attachment_id}:/dev/stdout",
+            *(
+                f"{attachment_id}:{target_path}"
+                for attachment_id, target_path in targets.items()
+            ),
         ],
         check=True,
-        stdout=PIPE,
+        stdout=DEVNULL,
     )
-    return result.stdout
 
 
 def extract_subtitles(
@@ -81,12 +104,12 @@ def extract_subtitles(
     ]
     if not ass_track_ids:
         raise ExtractionError(f'no subtitles found in "{source_path}"')
-    ass = extract_track(source_path, ass_track_ids[track_num]).decode()
+    track_id = ass_track_ids[track_num]
     if str(output_path) == "-":
-        print(ass, end="")
+        print(extract_track(source_path, track_id).decode(), end="")
     else:
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_text(ass)
+        extract_track_to(source_path, track_id, output_path)
 
 
 def extract_attachments(source_path: Path, output_dir: Path) -> None:
@@ -94,11 +117,12 @@ def extract_attachments(source_path: Path, output_dir: Path) -> None:
     info = get_info(source_path)
     if not info["attachments"]:
         raise ExtractionError(f'no attachments found in "{source_path}"')
-    for i, attachment in enumerate(info["attachments"]):
-        target_path = output_dir / f"{i + 1}_{attachment['file_name']}"
-        target_path.write_bytes(
-            extract_attachment(source_path, attachment["id"])
-        )
+    targets = {
+        attachment["id"]: output_dir / f"{i + 1}_{attachment['file_name']}"
+        for i, attachment in enumerate(info["attachments"])
+    }
+    extract_attachments_to(source_path, targets)
+    for target_path in targets.values():
         print(
             f'Written {target_path.stat().st_size} bytes to "{target_path}"',
             file=sys.stderr,
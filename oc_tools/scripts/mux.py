@@ -2,56 +2,81 @@
 import argparse
 import contextlib
 import itertools
-import shelve
+import os
+import pickle
+import sqlite3
+import struct
 import subprocess
 import zlib
 from collections.abc import Iterable
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import IO, Any, cast
+from xml.etree import ElementTree
 
 import ass_tag_parser
 import fontTools.ttLib as font_tools
 import pysubs2
 import xdg
 
+from oc_tools.cache import CACHE_DIR, load_cached
+
 
 def ms_to_str(ms: int) -> str:
     return pysubs2.time.ms_to_str(ms, fractions=True)
 
 
-def pairwise(source: Iterable[Any]) -> Iterable[Any]:
-    "s -> (s0,s1), (s1,s2), (s2, s3), ..."
-    a, b = itertools.tee(source)
-    next(b, None)
-    return zip(a, b)
-
-
 TT_NAME_ID_FONT_FAMILY = 1
 TT_NAME_ID_FULL_NAME = 4
 TT_NAME_ID_TYPOGRAPHIC_FAMILY = 16
 TT_PLATFORM_MICROSOFT = 3
 
-SHELVE_PATH = Path(xdg.XDG_CACHE_HOME) / "oc-tools.dat"
+CRC32_CHUNK_SIZE = 1024 * 1024
+CRC32_POLYNOMIAL = 0xEDB88320
+
+FONT_CACHE_PATH = CACHE_DIR / "fonts.db"
+LEGACY_FONT_CACHE_GLOBS = [
+    "oc-tools.dat*",
+    "oc-tools.pkl",
+    "oc-tools-fonts.db*",
+]
+FONT_CACHE_VERSION = 3
+
+EBML_ID_HEADER = 0x1A45DFA3
+EBML_ID_SEGMENT = 0x18538067
+EBML_ID_INFO = 0x1549A966
+EBML_ID_TIMESTAMP_SCALE = 0x2AD7B1
+EBML_ID_DURATION = 0x4489
+EBML_ID_CLUSTER = 0x1F43B675
+EBML_DEFAULT_TIMESTAMP_SCALE = 1_000_000
+MKV_SUFFIXES = {".mkv", ".mka", ".mks", ".webm"}
 FONT_DIRS = [
     Path(xdg.XDG_CONFIG_HOME) / "oc-fonts",
     Path("~/.local/share/fonts").expanduser(),
     Path("/usr/share/fonts/TTF"),
     Path("/usr/share/fonts/OTF"),
 ]
+LANG_MAP = {
+    "en": "eng",
+    "eng": "eng",
+    "en-us": "eng",
+    "pl": "pol",
+    "pol": "pol",
+    "pl-pl": "pol",
+    "ro": "rum",
+    "ro-ro": "rum",
+    "nl": "dut",
+    "nl-nl": "dut",
+}
 
 
 def get_iso_639_2_lang_code(lang: str) -> str:
     lang = lang.lower().replace("_", "-")
-    if lang in {"en", "eng", "en-us"}:
-        return "eng"
-    if lang in {"pl", "pol", "pl-pl"}:
-        return "pol"
-    if lang in {"ro", "ro-ro"}:
-        return "rum"
-    if lang in {"nl", "nl-nl"}:
-        return "dut"
-    raise ValueError(f"unknown language {lang}")
+    try:
+        return LANG_MAP[lang]
+    except KeyError:
+        raise ValueError(f"unknown language {lang}") from None
 
 
 def single(source: Iterable[Any]) -> Any:
@@ -70,6 +95,12 @@ class Subtitles:
 
     @staticmethod
     def from_path(path: Path) -> "Subtitles":
+        # the cache is keyed by the resolved path, so the cached copy may
+        # have been loaded through a different alias
+        return replace(load_cached(path, "subs", Subtitles.parse), path=path)
+
+    @staticmethod
+    def parse(path: Path) -> "Subtitles":
         subs = pysubs2.SSAFile.load(path)
         return Subtitles(
             path=path,
@@ -83,6 +114,74 @@ class Subtitles:
         return get_iso_639_2_lang_code(self.info.get("Language", "en_US"))
 
 
+def read_ebml_vint(handle: IO[bytes], keep_marker: bool) -> tuple[int, int]:
+    data = handle.read(1)
+    if not data:
+        raise ValueError("unexpected end of file")
+    length = 9 - data[0].bit_length()
+    if length > 8:
+        raise ValueError("invalid EBML variable-length integer")
+    rest = handle.read(length - 1)
+    if len(rest) != length - 1:
+        raise ValueError("unexpected end of file")
+    value = data[0] if keep_marker else data[0] & (0xFF >> length)
+    for byte in rest:
+        value = (value << 8) | byte
+    return value, length
+
+
+def read_ebml_element_header(handle: IO[bytes]) -> tuple[int, int | None]:
+    element_id, _ = read_ebml_vint(handle, keep_marker=True)
+    size, length = read_ebml_vint(handle, keep_marker=False)
+    if size == (1 << (7 * length)) - 1:
+        return element_id, None  # unknown size
+    return element_id, size
+
+
+def get_mkv_duration(path: Path) -> int:
+    with path.open("rb") as handle:
+        element_id, size = read_ebml_element_header(handle)
+        if element_id != EBML_ID_HEADER or size is None:
+            raise ValueError("not a Matroska file")
+        handle.seek(size, os.SEEK_CUR)
+
+        element_id, _ = read_ebml_element_header(handle)
+        if element_id != EBML_ID_SEGMENT:
+            raise ValueError("missing segment")
+
+        # the segment info precedes the clusters in any sane muxer output
+        while True:
+            element_id, size = read_ebml_element_header(handle)
+            if element_id == EBML_ID_CLUSTER or size is None:
+                break
+            if element_id != EBML_ID_INFO:
+                handle.seek(size, os.SEEK_CUR)
+                continue
+
+            timestamp_scale = EBML_DEFAULT_TIMESTAMP_SCALE
+            duration: float | None = None
+            end = handle.tell() + size
+            while handle.tell() < end:
+                child_id, child_size = read_ebml_element_header(handle)
+                if child_size is None:
+                    raise ValueError("unknown-sized element in segment info")
+                payload = handle.read(child_size)
+                if len(payload) != child_size:
+                    raise ValueError("unexpected end of file")
+                if child_id == EBML_ID_TIMESTAMP_SCALE:
+                    timestamp_scale = int.from_bytes(payload, "big")
+                elif child_id == EBML_ID_DURATION:
+                    if child_size == 4:
+                        (duration,) = struct.unpack(">f", payload)
+                    elif child_size == 8:
+                        (duration,) = struct.unpack(">d", payload)
+            if duration is None:
+                raise ValueError("missing duration")
+            return int(duration * timestamp_scale / 1_000_000)
+
+    raise ValueError("segment info not found")
+
+
 @dataclass
 class Video:
     path: Path
@@ -94,9 +193,17 @@ class Video:
 
     @staticmethod
     def get_video_length(path: Path) -> int:
+        if path.suffix.lower() in MKV_SUFFIXES:
+            with contextlib.suppress(OSError, ValueError):
+                return get_mkv_duration(path)
+
         status = subprocess.run(
             [
                 "ffprobe",
+                "-probesize",
+                "32",
+                "-analyzeduration",
+                "0",
                 "-i",
                 str(path),
                 "-show_entries",
@@ -141,12 +248,13 @@ class Chapter:
 @dataclass
 class Font:
     names: list[str]
+    names_lower: frozenset[str]
     is_bold: bool
     is_italic: bool
 
     @staticmethod
     def from_path(font_path: Path) -> "Font":
-        font = font_tools.TTFont(font_path)
+        font = font_tools.TTFont(font_path, lazy=True)
         names: list[str] = []
 
         for record in font["name"].names:
@@ -163,6 +271,7 @@ class Font:
 
         return Font(
             names=names,
+            names_lower=frozenset(name.lower() for name in names),
             is_bold=bool(font["OS/2"].fsSelection & (1 << 5)),
             is_italic=bool(font["OS/2"].fsSelection & 1),
         )
@@ -237,7 +346,9 @@ def get_chapters(subs: list[Subtitles], video: Video) -> Iterable[Chapter]:
 
     lines[video.length] = {}
 
-    for ((start_time, titles), (end_time, _)) in pairwise(lines.items()):
+    for (start_time, titles), (end_time, _) in itertools.pairwise(
+        lines.items()
+    ):
         if any(text.startswith("#") for lang, text in titles.items()):
             continue
         if any(text.startswith("$") for lang, text in titles.items()):
@@ -262,52 +373,60 @@ def create_chapters_file(chapters: Iterable[Chapter]) -> Path | None:
     if not chapters:
         return None
     chapters_path = Path("chapters.tmp")
-    with chapters_path.open("w", encoding="utf-8") as handle:
-        handle.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        handle.write('<!DOCTYPE Chapters SYSTEM "matroskachapters.dtd">\n')
-        handle.write("<Chapters>\n")
-        handle.write("\t<EditionEntry>\n")
-        handle.write("\t\t<EditionFlagDefault>1</EditionFlagDefault>\n")
-        handle.write("\t\t<EditionFlagOrdered>1</EditionFlagOrdered>\n")
-        handle.write("\t\t<EditionFlagHidden>0</EditionFlagHidden>\n")
-        for chapter in chapters:
-            handle.write("\t\t<ChapterAtom>\n")
-            handle.write(
-                "\t\t\t<ChapterTimeStart>{start_time}</ChapterTimeStart>\n"
-                "\t\t\t<ChapterTimeEnd>{end_time}</ChapterTimeEnd>\n"
-                "\t\t\t<ChapterFlagEnabled>{enabled:d}</ChapterFlagEnabled>\n"
-                "\t\t\t<ChapterFlagHidden>{is_hidden:d}</ChapterFlagHidden>\n".format(
-                    enabled=True,
-                    start_time=ms_to_str(chapter.start_time),
-                    end_time=ms_to_str(chapter.end_time),
-                    is_hidden=chapter.is_hidden,
-                )
+
+    root = ElementTree.Element("Chapters")
+    edition = ElementTree.SubElement(root, "EditionEntry")
+    ElementTree.SubElement(edition, "EditionFlagDefault").text = "1"
+    ElementTree.SubElement(edition, "EditionFlagOrdered").text = "1"
+    ElementTree.SubElement(edition, "EditionFlagHidden").text = "0"
+    for chapter in chapters:
+        atom = ElementTree.SubElement(edition, "ChapterAtom")
+        ElementTree.SubElement(atom, "ChapterTimeStart").text = ms_to_str(
+            chapter.start_time
+        )
+        ElementTree.SubElement(atom, "ChapterTimeEnd").text = ms_to_str(
+            chapter.end_time
+        )
+        ElementTree.SubElement(atom, "ChapterFlagEnabled").text = "1"
+        ElementTree.SubElement(atom, "ChapterFlagHidden").text = (
+            f"{chapter.is_hidden:d}"
+        )
+        for title in chapter.titles:
+            display = ElementTree.SubElement(atom, "ChapterDisplay")
+            ElementTree.SubElement(display, "ChapterString").text = title.text
+            ElementTree.SubElement(display, "ChapterLanguage").text = (
+                title.language
             )
-            for title in chapter.titles:
-                handle.write(
-                    "\t\t\t<ChapterDisplay>\n"
-                    "\t\t\t\t<ChapterString>{text}</ChapterString>\n"
-                    "\t\t\t\t<ChapterLanguage>{language}</ChapterLanguage>\n"
-                    "\t\t\t</ChapterDisplay>\n".format(
-                        text=title.text, language=title.language
-                    )
-                )
-            handle.write("\t\t</ChapterAtom>\n")
-        handle.write("\t</EditionEntry>\n")
-        handle.write("</Chapters>")
+    ElementTree.indent(root, space="\t")
+
+    chapters_path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE Chapters SYSTEM "matroskachapters.dtd">\n'
+        + ElementTree.tostring(root, encoding="unicode"),
+        encoding="utf-8",
+    )
     return chapters_path
 
 
+def get_crc32_patch(current: int, target: int) -> bytes:
+    # run the crc32 register backwards over four bytes, starting from the
+    # target state; xoring the result with the current state yields the
+    # bytes that lead from one to the other
+    state = target ^ 0xFFFFFFFF
+    for _ in range(32):
+        if state & 0x80000000:
+            state = (((state ^ CRC32_POLYNOMIAL) << 1) | 1) & 0xFFFFFFFF
+        else:
+            state = (state << 1) & 0xFFFFFFFF
+    return (state ^ current ^ 0xFFFFFFFF).to_bytes(4, "little")
+
+
 def change_crc(path: Path, checksum: int) -> None:
-    tmp_path = Path("tmp.dat")
-    status = subprocess.run(
-        ["crcmanip", "patch", path, "-o", tmp_path, "%08x" % checksum],
-        check=True,
-    )
-    if status.returncode != 0:
-        raise RuntimeError("Error while patching CRC")
-    path.unlink()
-    tmp_path.rename(path)
+    with path.open("r+b") as handle:
+        with contextlib.suppress(AttributeError, OSError):
+            os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        current = get_incremental_crc32(handle)
+        handle.write(get_crc32_patch(current, checksum))
 
 
 def bold_to_weight(value: int | bool) -> int:
@@ -332,11 +451,16 @@ def get_used_font_styles(subs: Subtitles) -> Iterable[StyleInfo]:
         if line.is_comment:
             continue
 
-        style_info = style_name_to_style_info[line.style]
         try:
-            used_font_styles.add(style_info)
+            style_info = style_name_to_style_info[line.style]
         except KeyError:
             print(f"Invalid style at line #{i + 1}: {line.style}")
+            continue
+        used_font_styles.add(style_info)
+
+        # without override tags the line can only use its style's font
+        if "{" not in line.text:
+            continue
 
         weight = style_info.weight
         is_italic = style_info.is_italic
@@ -377,36 +501,126 @@ def get_used_font_styles(subs: Subtitles) -> Iterable[StyleInfo]:
     return used_font_styles
 
 
-def get_fonts(font_paths: Iterable[Path]) -> dict[Path, Font]:
-    with shelve.open(str(SHELVE_PATH)) as cache:
+def remove_legacy_font_caches() -> None:
+    for pattern in LEGACY_FONT_CACHE_GLOBS:
+        for path in Path(xdg.XDG_CACHE_HOME).glob(pattern):
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+
+def open_font_cache() -> sqlite3.Connection:
+    remove_legacy_font_caches()
+    FONT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(FONT_CACHE_PATH, isolation_level=None)
+    # WAL lets several mux processes read and write the cache at once
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version != FONT_CACHE_VERSION:
+        conn.execute("DROP TABLE IF EXISTS fonts")
+        conn.execute(f"PRAGMA user_version = {FONT_CACHE_VERSION}")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS fonts ("
+        "path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, blob BLOB)"
+    )
+    return conn
+
+
+def scan_font_files(
+    directories: Iterable[Path],
+) -> Iterable[tuple[Path, os.stat_result]]:
+    for directory in directories:
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        yield Path(entry.path), entry.stat()
+                except OSError:
+                    continue
+
+
+def get_fonts(
+    font_files: Iterable[tuple[Path, os.stat_result]], families: set[str]
+) -> dict[Path, Font]:
+    with contextlib.closing(open_font_cache()) as conn:
+        cache = {
+            path: (mtime, size, blob)
+            for path, mtime, size, blob in conn.execute(
+                "SELECT path, mtime, size, blob FROM fonts"
+            )
+        }
+
         fonts: dict[Path, Font] = {}
-        for font_path in font_paths:
-            cache_key = "font-" + str(font_path.resolve())
-            font = cast(Font, cache.get(cache_key, None))
-            if not font:
+        new_rows: list[tuple[str, int, int, bytes]] = []
+        for font_path, stat in font_files:
+            cache_key = str(font_path.resolve())
+            entry = cache.get(cache_key)
+            font: Font | None = None
+            cached = False
+            if entry and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                try:
+                    font = cast(Font | None, pickle.loads(entry[2]))
+                    cached = True
+                except Exception:
+                    # stale or unimportable entry, parse the file again
+                    pass
+            if not cached:
                 try:
                     font = Font.from_path(font_path)
                 except Exception:
-                    continue
-                cache[cache_key] = font
-            fonts[font_path] = font
+                    # remember files that are not fonts as well, so that
+                    # they are not reopened on every run
+                    font = None
+                new_rows.append(
+                    (
+                        cache_key,
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                        pickle.dumps(font, protocol=pickle.HIGHEST_PROTOCOL),
+                    )
+                )
+            if font and not font.names_lower.isdisjoint(families):
+                fonts[font_path] = font
+
+        if new_rows:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO fonts (path, mtime, size, blob) "
+                "VALUES (?, ?, ?, ?)",
+                new_rows,
+            )
+            conn.execute("COMMIT")
+
         return fonts
 
 
 def filter_fonts(
-    used_font_styles: Iterable[StyleInfo], font_paths: Iterable[Path]
+    used_font_styles: Iterable[StyleInfo],
+    font_files: Iterable[tuple[Path, os.stat_result]],
 ) -> set[Path]:
-    fonts = get_fonts(font_paths)
+    used_font_styles = sorted(used_font_styles, key=lambda s: s.family)
+    fonts = get_fonts(
+        font_files,
+        families={style.family.lower() for style in used_font_styles},
+    )
+
+    family_index: dict[str, list[tuple[Path, Font]]] = {}
+    for font_path, font in fonts.items():
+        for name in font.names_lower:
+            family_index.setdefault(name, []).append((font_path, font))
 
     ret: set[Path] = set()
-    for style in sorted(used_font_styles, key=lambda s: s.family):
+    for style in used_font_styles:
         candidates = []
-        for font_path, font in fonts.items():
-            if style.family.lower() in [n.lower() for n in font.names]:
-                weight = (font.is_bold == (style.weight > 400)) + (
-                    font.is_italic == style.is_italic
-                )
-                candidates.append((weight, font_path))
+        for font_path, font in family_index.get(style.family.lower(), []):
+            weight = (font.is_bold == (style.weight > 400)) + (
+                font.is_italic == style.is_italic
+            )
+            candidates.append((weight, font_path))
         candidates.sort(key=lambda i: -i[0])
 
         print(
@@ -426,24 +640,23 @@ def filter_fonts(
 
 def get_incremental_crc32(handle: IO[bytes]) -> int:
     ret = 0
-    chunk = handle.read(1024)
-    if len(chunk):
-        ret = zlib.crc32(chunk)
-        while True:
-            chunk = handle.read(1024)
-            if len(chunk) > 0:
-                ret = zlib.crc32(chunk, ret)
-            else:
-                break
-    ret &= 0xFFFFFFFF
+    while chunk := handle.read(CRC32_CHUNK_SIZE):
+        ret = zlib.crc32(chunk, ret)
     return ret
 
 
+def get_file_crc32(path: Path) -> int:
+    with path.open("rb") as handle:
+        return get_incremental_crc32(handle)
+
+
 def get_checksum(version: int, episode: int, paths: Iterable[Path]) -> int:
+    paths = sorted(paths)
+    with ThreadPoolExecutor() as executor:
+        path_checksums = list(executor.map(get_file_crc32, paths))
+
     checksum = 0
-    for path in sorted(paths):
-        with path.open("rb") as handle:
-            path_checksum = get_incremental_crc32(handle)
+    for path, path_checksum in zip(paths, path_checksums):
         print(f"{path_checksum:08X} {path}")
         checksum ^= path_checksum & 0xFFFF0000
     checksum |= version << 12
@@ -508,25 +721,25 @@ def main() -> None:
     episode = args.ep
     version = args.version
 
-    subs = [Subtitles.from_path(path) for path in get_subs_paths(episode)]
-    video = Video.from_path(get_video_path(episode))
+    with ThreadPoolExecutor() as executor:
+        video_future = executor.submit(
+            Video.from_path, get_video_path(episode)
+        )
+        subs = list(executor.map(Subtitles.from_path, get_subs_paths(episode)))
+        video = video_future.result()
 
     subs = sort_subs(subs)
 
     with header("Collecting fonts"):
-        available_font_paths: list[Path] = []
-        for directory in FONT_DIRS:
-            if directory.exists():
-                available_font_paths += list(directory.iterdir())
-
-        if not available_font_paths:
+        available_font_files = list(scan_font_files(FONT_DIRS))
+        if not available_font_files:
             raise RuntimeError("No fonts found")
 
-        used_font_styles: list[StyleInfo] = list(
-            sum([list(get_used_font_styles(sub)) for sub in subs], [])
+        used_font_styles = itertools.chain.from_iterable(
+            get_used_font_styles(sub) for sub in subs
         )
         source_font_paths = filter_fonts(
-            used_font_styles, available_font_paths
+            used_font_styles, available_font_files
         )
 
     with header("Collecting chapters"):
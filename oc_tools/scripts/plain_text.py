@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import sys
 from pathlib import Path
 
-from ass_parser import read_ass
 from ass_tag_parser import ass_to_plaintext
 
+from oc_tools.cache import cached_read_ass
 from oc_tools.util import wrap_exceptions
 
 
@@ -22,10 +23,14 @@ def main() -> None:
         if not source.exists():
             raise RuntimeError(f'File "{source}" does not exist.')
 
-        ass_file = read_ass(source)
-        for event in ass_file.events:
-            if not event.actor.startswith("["):
-                print(ass_to_plaintext(event.text).replace("\n", " "))
+        ass_file = cached_read_ass(source)
+        sys.stdout.write(
+            "".join(
+                ass_to_plaintext(event.text).replace("\n", " ") + "\n"
+                for event in ass_file.events
+                if not event.actor.startswith("[")
+            )
+        )
 
 
 if __name__ == "__main__":
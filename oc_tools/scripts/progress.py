@@ -1,17 +1,21 @@
-#!/usr/bin/env python3.9
-from collections import OrderedDict
+#!/usr/bin/env python3
+import functools
+import sys
+from collections import deque
 from collections.abc import Iterable
 from pathlib import Path
-from typing import Any
 
 import colorama
 import xdg
 
 DATA_PATH = Path(xdg.XDG_CONFIG_HOME) / "oc-progress.txt"
 
-
-def uniq(source: Iterable[Any]) -> list[Any]:
-    return list(OrderedDict.fromkeys(source))
+COLOR_PL = colorama.Style.BRIGHT + colorama.Fore.RED
+COLOR_EN = colorama.Style.BRIGHT + colorama.Fore.GREEN
+COLOR_RELEASE = colorama.Style.BRIGHT + colorama.Fore.BLUE
+COLOR_RESET = colorama.Style.RESET_ALL
+COLOR_DONE = colorama.Style.BRIGHT + colorama.Fore.GREEN
+COLOR_TODO = colorama.Fore.BLACK
 
 
 def split(source: str, delim: str) -> list[str]:
@@ -20,63 +24,67 @@ def split(source: str, delim: str) -> list[str]:
 
 class AnimeProgress:
     def __init__(
-        self, title: str, episodes: dict[tuple[int, str, str], bool]
+        self,
+        title: str,
+        episodes: dict[tuple[int, str, str], bool],
+        release_count: int,
     ) -> None:
         self.title = title
         self.episodes = episodes
 
-        self.min_episode = min(
-            episode for episode, category, state in self.episodes.keys()
-        )
-        self.max_episode = max(
-            episode for episode, category, state in self.episodes.keys()
-        )
-        self.categories = uniq(
-            category for episode, category, state in self.episodes.keys()
-        )
+        if not self.episodes:
+            raise ValueError(f'no episodes found for "{title}"')
+
+        self.min_episode = self.max_episode = next(iter(self.episodes))[0]
+        category_steps: dict[str, dict[str, None]] = {}
+        self.step_states: dict[tuple[str, str], dict[int, bool]] = {}
+        for (episode, category, step), state in self.episodes.items():
+            if episode < self.min_episode:
+                self.min_episode = episode
+            elif episode > self.max_episode:
+                self.max_episode = episode
+            category_steps.setdefault(category, {})[step] = None
+            self.step_states.setdefault((category, step), {})[episode] = state
+
+        self.categories = list(category_steps)
         self.category_steps = {
-            category: uniq(
-                state
-                for episode, episode_category, state in self.episodes.keys()
-                if category == episode_category
-            )
-            for category in self.categories
+            category: list(steps) for category, steps in category_steps.items()
         }
 
-        self.finished = all(
-            self.get_state(episode, category="release", step="Release")
-            for episode in range(self.min_episode, self.max_episode + 1)
+        self.finished = (
+            release_count == self.max_episode - self.min_episode + 1
         )
 
     def get_category_steps(self, category: str) -> list[str]:
         return self.category_steps.get(category) or []
 
-    def get_state(self, episode: int, category: str, step: str) -> bool | None:
-        return self.episodes.get((episode, category, step), None)
+    def get_step_states(self, category: str, step: str) -> dict[int, bool]:
+        return self.step_states.get((category, step)) or {}
 
 
 def get_progress() -> Iterable[AnimeProgress]:
     with DATA_PATH.open("r", encoding="utf-8") as handle:
-        lines = [
+        lines = deque(
             line
             for line in map(str.strip, handle)
             if line and not line.startswith("#")
-        ]
+        )
 
         while lines:
-            title = lines.pop(0)
+            title = lines.popleft()
 
             category_steps_map: dict[str, list[str]] = {}
 
             while lines and "|" not in lines[0]:
-                category_line = lines.pop(0)
+                category_line = lines.popleft()
                 category, steps_line = split(category_line, ":")
                 category_steps_map[category] = split(steps_line, ",")
             category_steps_map["release"] = ["Release"]
 
             episode_states: dict[tuple[int, str, str], bool] = {}
+            released_episodes: set[int] = set()
             while lines and "|" in lines[0]:
-                state_line = lines.pop(0)
+                state_line = lines.popleft()
 
                 episode_str, *category_state_lines = split(state_line, "|")
                 episode = int(episode_str)
@@ -85,13 +93,22 @@ def get_progress() -> Iterable[AnimeProgress]:
                     category_steps_map.items(), category_state_lines
                 ):
                     for step, char in zip(category_steps, category_state):
-                        episode_states[episode, category, step] = (
-                            char.lower() == "x"
-                        )
-
-            yield AnimeProgress(title=title, episodes=episode_states)
+                        state = char.lower() == "x"
+                        episode_states[episode, category, step] = state
+                        if category == "release":
+                            if state:
+                                released_episodes.add(episode)
+                            else:
+                                released_episodes.discard(episode)
+
+            yield AnimeProgress(
+                title=title,
+                episodes=episode_states,
+                release_count=len(released_episodes),
+            )
 
 
+@functools.lru_cache(maxsize=None)
 def get_step_title(step: str, category: str) -> str:
     if category == "release":
         return "Release"
@@ -111,31 +128,34 @@ def print_progress_step(
     anime: AnimeProgress, category: str, step: str, longest_title: int
 ) -> None:
     if category.upper() == "PL":
-        print(colorama.Style.BRIGHT + colorama.Fore.RED, end="")
+        color = COLOR_PL
     elif category.upper() == "EN":
-        print(colorama.Style.BRIGHT + colorama.Fore.GREEN, end="")
+        color = COLOR_EN
     elif category.lower() == "release":
-        print(colorama.Style.BRIGHT + colorama.Fore.BLUE, end="")
+        color = COLOR_RELEASE
     else:
-        print(colorama.Style.RESET_ALL, end="")
-    print(
-        get_step_title(step, category).ljust(longest_title),
-        end=" ",
-    )
+        color = COLOR_RESET
 
+    states = anime.get_step_states(category, step)
+    parts = [color, get_step_title(step, category).ljust(longest_title), " "]
+    # only emit escape codes when the color actually changes
+    last_color = None
     for episode in range(anime.min_episode, anime.max_episode + 1):
         idx = episode - anime.min_episode
-        if anime.get_state(episode, category, step):
-            print(colorama.Style.BRIGHT + colorama.Fore.GREEN, end="")
-            print("\N{BLACK SQUARE}", end="")
+        if states.get(episode):
+            square_color, square = COLOR_DONE, "\N{BLACK SQUARE}"
         else:
-            print(colorama.Fore.BLACK, end="")
-            print("\N{WHITE SQUARE}", end="")
+            square_color, square = COLOR_TODO, "\N{WHITE SQUARE}"
+        if square_color != last_color:
+            parts.append(square_color)
+            last_color = square_color
+        parts.append(square)
         if idx % 5 == 4:
-            print(" ", end="")
+            parts.append(" ")
         if idx % 10 == 9:
-            print(" ", end="")
-    print(colorama.Style.RESET_ALL)
+            parts.append(" ")
+    parts.append(COLOR_RESET + "\n")
+    sys.stdout.write("".join(parts))
 
 
 def print_progress(progress: list[AnimeProgress]) -> None:
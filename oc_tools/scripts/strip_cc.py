@@ -7,6 +7,11 @@ from pathlib import Path
 import ass_tag_parser
 from pysubs2 import SSAFile
 
+ACTOR_REGEX = re.compile(r"\(.*\)")
+# line continuations, distant dialogues and brackets
+STRIPPED_CHARS_REGEX = re.compile("[➡≪＜＞《》]")
+SUPERFLUOUS_PERIOD_REGEX = re.compile("([…！？])。")
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
@@ -34,15 +39,13 @@ def main():
                 text += ass_item.text
 
         for line in text.split("\\N"):
-            line = re.sub(r"\(.*\)", "", line)  # actors
-            line = re.sub("➡", "", line)  # line continuation
-            line = re.sub("≪", "", line)  # distant dialogues
-            line = re.sub("[＜＞《》]", "", line)
-            line = re.sub("｡", "。", line)  # half-width period
-            line = re.sub("([…！？])。", r"\1", line)  # superfluous periods
+            line = ACTOR_REGEX.sub("", line)
+            line = STRIPPED_CHARS_REGEX.sub("", line)
+            line = line.replace("｡", "。")  # half-width period
+            line = SUPERFLUOUS_PERIOD_REGEX.sub(r"\1", line)
             line = line.rstrip("・")
 
-            line = re.sub(" ", "", line)  # Japanese doesn't need spaces
+            line = line.replace(" ", "")  # Japanese doesn't need spaces
 
             if line:
                 lines.append(line)
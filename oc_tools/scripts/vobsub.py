@@ -1,21 +1,34 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
 import io
+import itertools
 import logging
+import mmap
+import os
 import re
 import struct
+import subprocess
+import tempfile
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import timedelta
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 import PIL.Image
 import PIL.ImageOps
-import pytesseract
 from ass_parser import AssEvent, AssFile, write_ass
 
 logger = logging.getLogger(__file__)
 
+BATCH_SIZE = 32
+
+U32 = struct.Struct(">I")
+U16 = struct.Struct(">H")
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
@@ -38,7 +51,7 @@ class Color:
 
 @dataclass
 class SubsIndexItem:
-    timestamp: timedelta
+    timestamp_ms: int
     file_pos: int
 
 
@@ -97,153 +110,185 @@ def vobsub_color(value: str) -> Color:
     )
 
 
-def analyze_idx(path: Path) -> SubsIndex:
-    idx = SubsIndex()
+def parse_idx_size(idx: SubsIndex, value: str) -> None:
+    parts = value.split("x")
+    idx.width = vobsub_int(parts[0])
+    idx.height = vobsub_int(parts[1])
 
-    for line in path.read_text().splitlines():
-        line = line.strip()
-        if ":" not in line:
-            continue
 
-        key, value = line.split(":", 1)
-        key = key.strip()
-        value = value.strip()
+def parse_idx_origin(idx: SubsIndex, value: str) -> None:
+    parts = value.split(",")
+    idx.origin_x = vobsub_int(parts[0])
+    idx.origin_y = vobsub_int(parts[1])
 
-        if key == "size":
-            parts = value.split("x")
-            idx.width = vobsub_int(parts[0])
-            idx.height = vobsub_int(parts[1])
 
-        elif key == "org":
-            parts = value.split(",")
-            idx.origin_x = vobsub_int(parts[0])
-            idx.origin_y = vobsub_int(parts[1])
+def parse_idx_scale(idx: SubsIndex, value: str) -> None:
+    parts = value.split(",")
+    idx.scale_x = vobsub_float(parts[0])
+    idx.scale_y = vobsub_float(parts[1])
 
-        elif key == "scale":
-            parts = value.split(",")
-            idx.scale_x = vobsub_float(parts[0])
-            idx.scale_y = vobsub_float(parts[1])
 
-        elif key == "alpha":
-            idx.alpha = vobsub_float(value)
+def parse_idx_alpha(idx: SubsIndex, value: str) -> None:
+    idx.alpha = vobsub_float(value)
 
-        elif key == "smooth":
-            idx.smooth = vobsub_bool(value)
 
-        elif key == "fadein/out":
-            parts = value.split(",")
-            idx.fade_in = vobsub_int(parts[0])
-            idx.fade_out = vobsub_int(parts[1])
+def parse_idx_smooth(idx: SubsIndex, value: str) -> None:
+    idx.smooth = vobsub_bool(value)
 
-        elif key == "time offset":
-            idx.time_offset = vobsub_int(value)
 
-        elif key == "forced subs":
-            idx.forced_subs = vobsub_bool(value)
+def parse_idx_fade(idx: SubsIndex, value: str) -> None:
+    parts = value.split(",")
+    idx.fade_in = vobsub_int(parts[0])
+    idx.fade_out = vobsub_int(parts[1])
 
-        elif key == "palette":
-            parts = value.split(",")
-            idx.palette = list(map(vobsub_color, parts))
 
-        elif key == "langidx":
-            idx.lang_idx = vobsub_int(value)
+def parse_idx_time_offset(idx: SubsIndex, value: str) -> None:
+    idx.time_offset = vobsub_int(value)
+
+
+def parse_idx_forced_subs(idx: SubsIndex, value: str) -> None:
+    idx.forced_subs = vobsub_bool(value)
+
+
+def parse_idx_palette(idx: SubsIndex, value: str) -> None:
+    parts = value.split(",")
+    idx.palette = list(map(vobsub_color, parts))
+
+
+def parse_idx_lang_idx(idx: SubsIndex, value: str) -> None:
+    idx.lang_idx = vobsub_int(value)
 
-        elif key == "timestamp":
-            match = re.match(
-                r"(\d{2}):(\d{2}):(\d{2}):(\d{3}), filepos: ([0-9a-f]+)",
-                value,
-                flags=re.I,
-            )
-            if not match:
-                raise ValueError(f"invalid idx item: {value}")
-            idx.items.append(
-                SubsIndexItem(
-                    timestamp=timedelta(
-                        hours=int(match.group(1)),
-                        minutes=int(match.group(2)),
-                        seconds=int(match.group(3)),
-                        milliseconds=int(match.group(4)),
-                    ),
-                    file_pos=int(match.group(5), 16),
-                )
-            )
+
+def parse_idx_timestamp(idx: SubsIndex, value: str) -> None:
+    time_part, sep, file_pos_part = value.partition(", filepos:")
+    parts = time_part.split(":")
+    if not sep or len(parts) != 4:
+        raise ValueError(f"invalid idx item: {value}")
+    hours, minutes, seconds, milliseconds = map(int, parts)
+    idx.items.append(
+        SubsIndexItem(
+            timestamp_ms=((hours * 60 + minutes) * 60 + seconds) * 1000
+            + milliseconds,
+            file_pos=int(file_pos_part, 16),
+        )
+    )
+
+
+IDX_HANDLERS: dict[str, Callable[[SubsIndex, str], None]] = {
+    "size": parse_idx_size,
+    "org": parse_idx_origin,
+    "scale": parse_idx_scale,
+    "alpha": parse_idx_alpha,
+    "smooth": parse_idx_smooth,
+    "fadein/out": parse_idx_fade,
+    "time offset": parse_idx_time_offset,
+    "forced subs": parse_idx_forced_subs,
+    "palette": parse_idx_palette,
+    "langidx": parse_idx_lang_idx,
+    "timestamp": parse_idx_timestamp,
+}
+
+
+def analyze_idx(path: Path) -> SubsIndex:
+    idx = SubsIndex()
+
+    for line in path.read_bytes().decode("utf-8").splitlines():
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        handler = IDX_HANDLERS.get(key.strip())
+        if handler:
+            handler(idx, value.strip())
 
     return idx
 
 
 class IoWrapper:
-    def __init__(self, handle):
-        self.handle = handle
-        self.base_offset = handle.tell()
-        handle.seek(0, io.SEEK_END)
-        self._size = handle.tell()
-        handle.seek(self.base_offset)
+    def __init__(self, data: bytes | mmap.mmap, base_offset: int = 0) -> None:
+        self.data = data
+        self.base_offset = base_offset
+        self.pos = base_offset
 
     def tell(self) -> int:
-        return self.handle.tell() - self.base_offset
+        return self.pos - self.base_offset
 
     def size(self) -> int:
-        return self._size
+        return len(self.data)
 
     def seek(self, pos: int) -> None:
-        self.handle.seek(self.base_offset + pos)
+        self.pos = self.base_offset + pos
 
     def skip(self, pos: int) -> None:
-        self.handle.seek(pos, io.SEEK_CUR)
+        self.pos += pos
 
     def read(self, num: int) -> bytes:
-        return self.handle.read(num)
+        ret = self.data[self.pos : self.pos + num]
+        self.pos += len(ret)
+        return ret
+
+    def read_at(self, pos: int, num: int) -> memoryview:
+        start = self.base_offset + pos
+        return memoryview(self.data)[start : start + num]
 
     def read_u32(self) -> int:
-        return struct.unpack(">I", self.handle.read(4))[0]
+        (ret,) = U32.unpack_from(self.data, self.pos)
+        self.pos += 4
+        return ret
 
     def read_u16(self) -> int:
-        return struct.unpack(">H", self.handle.read(2))[0]
+        (ret,) = U16.unpack_from(self.data, self.pos)
+        self.pos += 2
+        return ret
 
     def read_u8(self) -> int:
-        return struct.unpack(">B", self.handle.read(1))[0]
+        ret = self.data[self.pos]
+        self.pos += 1
+        return ret
 
 
 def decode_vobsub_line(
     src: bytes,
     src_ofs: int,
     src_len: int,
-    trg: bytes,
+    trg: np.ndarray,
     trg_ofs: int,
     width: int,
     max_pixels: int,
 ) -> None:
-    nibbles = [0] * (src_len * 2)
+    if width <= 0:
+        # nothing to fill, and the run loop below would never advance
+        return
 
-    for i in range(src_len):
-        b = src[src_ofs + i] & 0xFF
-        nibbles[2 * i] = b >> 4
-        nibbles[2 * i + 1] = b & 0x0F
+    data = np.frombuffer(src, dtype=np.uint8, count=src_len, offset=src_ofs)
+    nibbles_array = np.empty(src_len * 2, dtype=np.uint8)
+    nibbles_array[0::2] = data >> 4
+    nibbles_array[1::2] = data & 0x0F
+    nibbles = nibbles_array.tolist()
 
     index = 0
     sum_pixels = 0
     x = 0
 
     while index < len(nibbles) and sum_pixels < max_pixels:
-        tmp = nibbles[index] & 0xFF
+        tmp = nibbles[index]
         index += 1
         if tmp == 0:
             # three or four nibble code
-            tmp = nibbles[index] & 0xFF
+            tmp = nibbles[index]
             index += 1
             if (tmp & 0xC) != 0:
                 # three byte code
                 length = tmp << 2
-                tmp = nibbles[index] & 0xFF
+                tmp = nibbles[index]
                 index += 1
                 length |= tmp >> 2
             else:
                 # line feed or four nibble code
                 length = tmp << 6
-                tmp = nibbles[index] & 0xFF
+                tmp = nibbles[index]
                 index += 1
                 length |= tmp << 2
-                tmp = nibbles[index] & 0xFF
+                tmp = nibbles[index]
                 index += 1
                 length |= tmp >> 2
                 if length == 0:
@@ -254,7 +299,7 @@ def decode_vobsub_line(
                         # handle line feed
                         trg_ofs += 2 * width
                         # lines are interlaced!
-                        sum_pixels = ((trg_ofs / width) / 2) * width
+                        sum_pixels = (trg_ofs // width // 2) * width
                         x = 0
                     if (index & 1) == 1:
                         index += 1
@@ -264,16 +309,19 @@ def decode_vobsub_line(
             if length == 0:
                 # two nibble code
                 length = tmp << 2
-                tmp = nibbles[index] & 0xFF
+                tmp = nibbles[index]
                 index += 1
                 length |= tmp >> 2
 
         col = tmp & 0x3
         sum_pixels += length
 
-        for i in range(length):
-            trg[trg_ofs + x] = col
-            x += 1
+        # fill the run one line segment at a time
+        while length > 0:
+            count = min(length, width - x)
+            trg[trg_ofs + x : trg_ofs + x + count] = col
+            x += count
+            length -= count
             if x >= width:
                 trg_ofs += 2 * width  # lines are interlaced!
                 x = 0
@@ -296,41 +344,35 @@ def decode_vobsub_picture(
     length = 0
     pack_header_size = 0
     first_pack_found = False
-    rle_fragments = []
+    rle_fragments: list[tuple[int, int]] = []
 
     while ofs < handle.size() and (
         ctrl_header_copied < ctrl_size or ctrl_size == -1
     ):
         start_ofs = ofs
+        # the header fields are laid out back to back, so a single seek per
+        # packet is enough
         handle.seek(ofs)
         assert handle.read_u32() == 0x000001BA
-        ofs += 13
-        handle.seek(ofs)
+        handle.skip(9)
         stuff_ofs = handle.read_u8() & 7
-        ofs += 1 + stuff_ofs
-        handle.seek(ofs)
+        handle.skip(stuff_ofs)
         assert handle.read_u32() == 0x000001BD
-        ofs += 4
-        handle.seek(ofs)
         length = handle.read_u16()
-        next_ofs = ofs + 2 + length
-        ofs += 2
-        pack_header_size = ofs - start_ofs
-        ofs += 1
-        handle.seek(ofs)
+        next_ofs = handle.tell() + length
+        pack_header_size = handle.tell() - start_ofs
+        handle.skip(1)
         first_pack = handle.read_u8() & 0x80 == 0x80
-        ofs += 1
-        handle.seek(ofs)
         pts_length = handle.read_u8()
-        ofs += 1 + pts_length  # skip PTS and stream ID
-        handle.seek(ofs)
+        handle.skip(pts_length)  # skip PTS
         # packet_stream_id = handle.read_u8() - 0x20
-        ofs += 1
+        handle.skip(1)
+        ofs = handle.tell()
 
         # if packet_stream_id != stream_id:
         #     # packet doesn't belong to stream -> skip
         #     if next_ofs % 0x800 != 0:
-        #         ofs = (next_ofs / 0x800 + 1) * 0x800
+        #         ofs = (next_ofs + 0x7FF) & ~0x7FF
         #         logger.warning(
         #             "Offset to next fragment is invalid. Fixed to: {ofs:08x}"
         #         )
@@ -342,10 +384,8 @@ def decode_vobsub_picture(
         header_size = ofs - start_ofs
 
         if first_pack and pts_length >= 5:
-            handle.seek(ofs)
             size = handle.read_u16()
             ofs += 2
-            handle.seek(ofs)
             ctrl_ofs_rel = handle.read_u16()
             rle_size = ctrl_ofs_rel - 2
             # calculate size of RLE buffer
@@ -373,20 +413,20 @@ def decode_vobsub_picture(
         diff = next_ofs - ctrl_ofs - ctrl_header_copied
         if diff < 0:
             diff = 0
-        copied = ctrl_header_copied
-        for i in range(diff):
-            if ctrl_header_copied < ctrl_size:
-                handle.seek(ctrl_ofs + i + copied)
-                ctrl_header.write(bytes([handle.read_u8()]))
-                ctrl_header_copied += 1
+        bytes_to_copy = min(diff, ctrl_size - ctrl_header_copied)
+        if bytes_to_copy > 0:
+            handle.seek(ctrl_ofs + ctrl_header_copied)
+            chunk = handle.read(bytes_to_copy)
+            ctrl_header.write(chunk)
+            ctrl_header_copied += len(chunk)
 
         rle_fragments.append(
-            [ofs, length - header_size - diff + pack_header_size]
+            (ofs, length - header_size - diff + pack_header_size)
         )
         rle_buffer_found += rle_fragments[-1][1]
 
         if ctrl_header_copied != ctrl_size and (next_ofs % 0x800 != 0):
-            ofs = (next_ofs / 0x800 + 1) * 0x800
+            ofs = (next_ofs + 0x7FF) & ~0x7FF
             logger.warning(
                 f"Offset to next fragment is invalid. Fixed to: {ofs:08x}"
             )
@@ -412,8 +452,7 @@ def decode_vobsub_picture(
     delay = -1
     col_alpha_update = False
 
-    ctrl_header.seek(0)
-    ctrl_header_handle = IoWrapper(ctrl_header)
+    ctrl_header_handle = IoWrapper(ctrl_header.getvalue())
 
     # parse control header
     index = 0
@@ -434,12 +473,10 @@ def decode_vobsub_picture(
             pass
 
         elif cmd == 3:  # palette info
-            ctrl_header_handle.seek(index)
             tmp = ctrl_header_handle.read_u8()
             index += 1
             pal[3] = tmp >> 4
             pal[2] = tmp & 0x0F
-            ctrl_header_handle.seek(index)
             tmp = ctrl_header_handle.read_u8()
             index += 1
             pal[1] = tmp >> 4
@@ -447,12 +484,10 @@ def decode_vobsub_picture(
             logger.debug(f"Palette: {pal}")
 
         elif cmd == 4:  # alpha info
-            ctrl_header_handle.seek(index)
             tmp = ctrl_header_handle.read_u8()
             index += 1
             alpha[3] = tmp >> 4
             alpha[2] = tmp & 0x0F
-            ctrl_header_handle.seek(index)
             tmp = ctrl_header_handle.read_u8()
             index += 1
             alpha[1] = tmp >> 4
@@ -462,7 +497,6 @@ def decode_vobsub_picture(
             logger.debug(f"Alpha: {alpha}")
 
         elif cmd == 5:  # coordinates
-            ctrl_header_handle.seek(index)
             tmp_a = ctrl_header_handle.read_u8()
             tmp_b = ctrl_header_handle.read_u8()
             tmp_c = ctrl_header_handle.read_u8()
@@ -477,7 +511,6 @@ def decode_vobsub_picture(
             index += 6
 
         elif cmd == 6:  # offset to RLE buffer
-            ctrl_header_handle.seek(index)
             even_ofs = ctrl_header_handle.read_u16() - 4
             odd_ofs = ctrl_header_handle.read_u16() - 4
             index += 4
@@ -535,7 +568,6 @@ def decode_vobsub_picture(
             index = next_index
             ctrl_header_handle.seek(index)
             delay = ctrl_header_handle.read_u16() * 10
-            ctrl_header_handle.seek(index + 2)
             next_index = ctrl_header_handle.read_u16() - ctrl_ofs_rel - 2
             ctrl_seq_count += 1
         if ctrl_seq_count > 2:
@@ -569,14 +601,11 @@ def decode_vobsub_picture(
     assert size_even > 0 and size_odd > 0, "Corrupt buffer offset information"
 
     # copy buffers
-    rle_buffer_handle = io.BytesIO()
-    for ofs, size in rle_fragments:
-        handle.seek(ofs)
-        rle_buffer_handle.write(handle.read(size))
-    rle_buffer_handle.seek(0)
-    rle_buffer = rle_buffer_handle.read()
+    rle_buffer = b"".join(
+        handle.read_at(ofs, size) for ofs, size in rle_fragments
+    )
 
-    decoded_pixels = np.zeros(width * height, dtype="b")
+    decoded_pixels = np.zeros(width * height, dtype=np.uint8)
 
     # decode even lines
     decode_vobsub_line(
@@ -603,26 +632,71 @@ def decode_vobsub_picture(
     if invert:
         pal[1], pal[3] = pal[3], pal[1]
 
-    palmap_r = np.array([idx.palette[pal[c]].red for c in range(4)])
-    palmap_g = np.array([idx.palette[pal[c]].green for c in range(4)])
-    palmap_b = np.array([idx.palette[pal[c]].blue for c in range(4)])
-    palmap_a = np.array([((alpha[c] * 0xFF) // 0xF) for c in range(4)])
+    lut = np.empty((4, 4), dtype=np.uint8)
+    for c in range(4):
+        color = idx.palette[pal[c]]
+        lut[c] = (color.red, color.green, color.blue, (alpha[c] * 0xFF) // 0xF)
+
+    if lut[0, 3] == 0:
+        lut[0, :3] = lut[3, :3]
 
-    if palmap_a[0] == 0:
-        palmap_r[0] = palmap_r[3]
-        palmap_g[0] = palmap_g[3]
-        palmap_b[0] = palmap_b[3]
+    image = PIL.Image.fromarray(lut[decoded_pixels.reshape(height, width)])
+    return image, delay
 
-    final_pixels = np.zeros(4 * width * height, dtype="b")
-    final_pixels[::4] = palmap_r[decoded_pixels]
-    final_pixels[1::4] = palmap_g[decoded_pixels]
-    final_pixels[2::4] = palmap_b[decoded_pixels]
-    final_pixels[3::4] = palmap_a[decoded_pixels]
 
-    image = PIL.Image.frombytes(
-        mode="RGBA", size=(width, height), data=bytes(final_pixels)
+def flatten_image(image: PIL.Image.Image) -> PIL.Image.Image:
+    # tesseract ignores the alpha channel of the images it reads, so
+    # composite them onto white like pytesseract.prepare() used to
+    background = PIL.Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, (0, 0), image.getchannel("A"))
+    return background
+
+
+def decode_pictures(
+    idx: SubsIndex,
+    sub_path: Path,
+    invert: bool,
+    jobs: list[tuple[int, Path, Path | None]],
+) -> list[tuple[int, bytes]]:
+    results: list[tuple[int, bytes]] = []
+    with sub_path.open("rb", buffering=0) as sub_file_handle, mmap.mmap(
+        sub_file_handle.fileno(), 0, access=mmap.ACCESS_READ
+    ) as sub_data:
+        for file_pos, ocr_path, output_path in jobs:
+            image, delay = decode_vobsub_picture(
+                idx, IoWrapper(sub_data, file_pos), invert=invert
+            )
+            if output_path:
+                image.save(output_path)
+            flatten_image(image).save(ocr_path)
+            digest = hashlib.blake2b(
+                f"{image.width}x{image.height}".encode(), digest_size=16
+            )
+            digest.update(image.tobytes())
+            results.append((delay, digest.digest()))
+    return results
+
+
+def ocr_images(image_paths: list[Path], list_path: Path) -> list[str]:
+    if not image_paths:
+        return []
+    # a single tesseract run over an image list avoids paying for process
+    # startup and model loading once per picture
+    list_path.write_text("".join(f"{path}\n" for path in image_paths))
+    # several of these run at once, so keep each one to a single OpenMP
+    # thread to avoid oversubscribing the CPU
+    result = subprocess.run(
+        ["tesseract", str(list_path), "stdout"],
+        env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
     )
-    return image, delay
+    if result.returncode != 0:
+        raise RuntimeError(f"tesseract failed: {result.stderr.decode()}")
+    pages = result.stdout.decode().split("\f")
+    if len(pages) < len(image_paths):
+        raise RuntimeError("tesseract returned fewer pages than images")
+    return pages[: len(image_paths)]
 
 
 def main() -> None:
@@ -641,34 +715,89 @@ def main() -> None:
 
     idx = analyze_idx(idx_path)
 
-    with sub_path.open("rb") as sub_file_handle:
-        ass_file = AssFile()
-        for i, item in enumerate(idx.items):
-            print(item.timestamp)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_paths = [
+            Path(tmp_dir) / f"{i+1:04d}.png" for i in range(len(idx.items))
+        ]
+        output_paths: list[Path | None]
+        if args.output_dir:
+            output_dir = args.output_dir.expanduser()
+            output_dir.mkdir(exist_ok=True, parents=True)
+            output_paths = [
+                output_dir / f"{sub_path.stem}-{i+1:04d}.png"
+                for i in range(len(idx.items))
+            ]
+        else:
+            output_paths = [None] * len(idx.items)
 
-            sub_file_handle.seek(item.file_pos)
-            image, delay = decode_vobsub_picture(
-                idx, IoWrapper(sub_file_handle), invert=args.invert
+        jobs = list(
+            zip(
+                (item.file_pos for item in idx.items),
+                image_paths,
+                output_paths,
             )
-            if args.output_dir:
-                image_path = (
-                    args.output_dir.expanduser()
-                    / f"{sub_path.stem}-{i+1:04d}.png"
-                )
-                image_path.parent.mkdir(exist_ok=True, parents=True)
-                image.save(image_path)
-            text = pytesseract.image_to_string(image)
-
-            ass_file.events.append(
-                AssEvent(
-                    start=item.timestamp.total_seconds() * 1000,
-                    end=item.timestamp.total_seconds() * 1000 + delay,
-                    text=text.replace("\n", r"\N"),
+        )
+        job_batches = [
+            jobs[i : i + BATCH_SIZE] for i in range(0, len(jobs), BATCH_SIZE)
+        ]
+
+        with ProcessPoolExecutor() as executor:
+            results = list(
+                itertools.chain.from_iterable(
+                    executor.map(
+                        partial(decode_pictures, idx, sub_path, args.invert),
+                        job_batches,
+                    )
                 )
             )
+        delays = [delay for delay, _digest in results]
+        digests = [digest for _delay, digest in results]
+
+        # repeated bitmaps (pauses, speaker tags etc.) only need to be
+        # recognized once
+        unique_image_paths: dict[bytes, Path] = {}
+        for digest, image_path in zip(digests, image_paths):
+            unique_image_paths.setdefault(digest, image_path)
+        ocr_paths = list(unique_image_paths.values())
+        image_batches = [
+            ocr_paths[i : i + BATCH_SIZE]
+            for i in range(0, len(ocr_paths), BATCH_SIZE)
+        ]
+        list_paths = [
+            Path(tmp_dir) / f"images-{i}.txt"
+            for i in range(len(image_batches))
+        ]
+
+        ass_file = AssFile()
+
+        # tesseract runs in subprocesses, so threads are enough to keep
+        # several of them busy at once; one per core, since each of them is
+        # limited to a single thread
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            ocr_batches = executor.map(ocr_images, image_batches, list_paths)
+            ocr_digests = iter(unique_image_paths)
+            ocr_cache: dict[bytes, str] = {}
+            for item, delay, digest in zip(idx.items, delays, digests):
+                # batches come back in order and every picture is queued at
+                # its first occurrence, so this never waits for more than
+                # the batch containing the current item
+                while digest not in ocr_cache:
+                    for text in next(ocr_batches):
+                        ocr_cache[next(ocr_digests)] = text
+                text = ocr_cache[digest]
+
+                print(timedelta(milliseconds=item.timestamp_ms))
+
+                ass_file.events.append(
+                    AssEvent(
+                        start=item.timestamp_ms,
+                        end=item.timestamp_ms + delay,
+                        text=text.replace("\n", r"\N"),
+                    )
+                )
 
-            print(text)
-            print(flush=True)
+                print(text)
+                print(flush=True)
 
     with args.output_ass.open("w") as handle:
         write_ass(ass_file, handle)
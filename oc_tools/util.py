@@ -1,21 +1,36 @@
 import re
 import sys
-from collections.abc import Callable, Iterable, Iterator
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
 from functools import wraps
 from typing import Any, TypeVar
 
 T = TypeVar("T")
 
+TIME_REGEX = re.compile(
+    """
+    ^(?P<sign>[+-])?
+    (?:(?P<hour>\\d+):)?
+    (?P<minute>\\d\\d):
+    (?P<second>\\d\\d)\\.
+    (?P<millisecond>\\d\\d\\d)\\d*$
+    """.strip(),
+    flags=re.VERBOSE,
+)
+
 
-def first(source: Iterator[T]) -> T | None:
-    return next(source, None)
+def first(source: Iterable[T]) -> T | None:
+    if isinstance(source, Sequence):
+        return source[0] if source else None
+    return next(iter(source), None)
 
 
-def last(source: Iterator[T]) -> T | None:
-    item = None
-    for item in source:
-        pass
-    return item
+def last(source: Iterable[T]) -> T | None:
+    if isinstance(source, Sequence):
+        return source[-1] if source else None
+    # let deque consume the iterator in C instead of looping in Python
+    tail = deque(source, maxlen=1)
+    return tail[0] if tail else None
 
 
 def wrap_exceptions(func: Callable[[], None]) -> Callable[[], None]:
@@ -34,27 +49,28 @@ def str_to_ms(text: str) -> int:
     :param text: input text
     :return: PTS
     """
-    result = re.match(
-        """
-        ^(?P<sign>[+-])?
-        (?:(?P<hour>\\d+):)?
-        (?P<minute>\\d\\d):
-        (?P<second>\\d\\d)\\.
-        (?P<millisecond>\\d\\d\\d)\\d*$
-        """.strip(),
-        text.strip(),
-        re.VERBOSE,
-    )
+    text = text.strip()
+
+    # fast path for the common MM:SS.mmm form
+    if text[:1] not in "+-" and text.count(":") == 1:
+        minute, rest = text.split(":")
+        second, _, fraction = rest.partition(".")
+        if (
+            len(minute) == 2
+            and len(second) == 2
+            and len(fraction) >= 3
+            and (minute + second + fraction).isdecimal()
+        ):
+            return (int(minute) * 60 + int(second)) * 1000 + int(fraction[:3])
 
+    result = TIME_REGEX.match(text)
     if not result:
         raise ValueError(f'invalid time format: "{text}"')
 
-    sign = result.group("sign")
-    hour = int(result.group("hour"))
-    minute = int(result.group("minute"))
-    second = int(result.group("second"))
-    millisecond = int(result.group("millisecond"))
-    ret = ((((hour * 60) + minute) * 60) + second) * 1000 + millisecond
+    sign, hour, minute, second, millisecond = result.groups()
+    ret = (
+        (((int(hour or 0) * 60) + int(minute)) * 60) + int(second)
+    ) * 1000 + int(millisecond)
     if sign == "-":
         ret = -ret
     return ret
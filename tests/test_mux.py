@@ -0,0 +1,49 @@
+import struct
+from pathlib import Path
+
+import pysubs2
+import pytest
+
+from oc_tools.scripts.mux import Subtitles, get_mkv_duration
+
+
+def build_mkv(duration_payload: bytes, duration_size: int) -> bytes:
+    info = bytes.fromhex("4489") + bytes([0x80 | duration_size])
+    info += duration_payload
+    info_size = len(info) - len(duration_payload) + duration_size
+    return (
+        bytes.fromhex("1A45DFA3")
+        + b"\x84abcd"
+        + bytes.fromhex("18538067")
+        + bytes.fromhex("01FFFFFFFFFFFFFF")
+        + bytes.fromhex("1549A966")
+        + bytes([0x80 | info_size])
+        + info
+    )
+
+
+def test_get_mkv_duration(tmp_path: Path) -> None:
+    path = tmp_path / "test.mkv"
+    path.write_bytes(build_mkv(struct.pack(">d", 1425123.0), 8))
+    assert get_mkv_duration(path) == 1425123
+
+
+def test_get_mkv_duration_truncated(tmp_path: Path) -> None:
+    path = tmp_path / "test.mkv"
+    path.write_bytes(build_mkv(struct.pack(">d", 1425123.0)[:3], 8))
+    with pytest.raises(ValueError):
+        get_mkv_duration(path)
+
+
+def test_subtitles_from_path_through_aliases(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("oc_tools.cache.CACHE_DIR", tmp_path / "cache")
+    path = tmp_path / "test.ass"
+    pysubs2.SSAFile().save(str(path))
+    alias = tmp_path / "alias.ass"
+    alias.symlink_to(path)
+
+    assert Subtitles.from_path(path).path == path
+    assert Subtitles.from_path(alias).path == alias
+    assert Subtitles.from_path(path).path == path